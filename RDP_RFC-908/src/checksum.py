@@ -0,0 +1,73 @@
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, fall back to struct.unpack
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, fall back to numpy or struct.unpack
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _jit_word_sum(buf):
+        """
+        Sum the 16-bit big-endian words of a uint8 array, padding an odd trailing byte with zero.
+        Compiled to machine code by numba on first use.
+        :param buf: uint8 array to sum.
+        :return: Unfolded sum of the words.
+        """
+        total = 0
+        n = buf.shape[0]
+        for i in range(0, n - 1, 2):
+            total += (buf[i] << 8) | buf[i + 1]
+        if n & 1:
+            total += buf[n - 1] << 8
+        return total
+else:
+    _jit_word_sum = None
+
+
+def word_sum(buf):
+    """
+    Sum the 16-bit big-endian words of a buffer, without folding the carries.
+    Uses numba if installed, then numpy, then struct.unpack.
+    :param buf: Bytes-like object to sum, an odd trailing byte is padded with zero.
+    :return: Sum of the words
+    """
+    if _jit_word_sum is not None:
+        return int(_jit_word_sum(np.frombuffer(buf, dtype=np.uint8)))
+
+    if len(buf) & 1:
+        buf = bytes(buf) + b'\x00'
+
+    if np is not None:
+        # Sum all 16-bit big-endian words in a single vectorized call
+        return int(np.frombuffer(buf, dtype='>u2').sum(dtype=np.uint64))
+
+    # Unpack all 16-bit words in one call and let sum() add them up
+    return sum(struct.unpack(f"!{len(buf) // 2}H", buf))
+
+
+def fold_checksum(total):
+    """
+    Turn a sum of 16-bit words into a one's complement checksum.
+    :param total: Sum of the words, e.g. from word_sum (sums of several even-length buffers may be added first)
+    :return: Checksum of the words
+    """
+    # Fold the carries back into the low 16 bits
+    total = (total & 0xffff) + (total >> 16)
+    total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def ones_complement_checksum(buf):
+    """
+    Compute the 16-bit one's complement checksum of a buffer.
+    :param buf: Bytes-like object to checksum, an odd trailing byte is padded with zero.
+    :return: Checksum of the buffer
+    """
+    return fold_checksum(word_sum(buf))
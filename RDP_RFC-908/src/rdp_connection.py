@@ -1,6 +1,36 @@
 from utility_functions import *
 from rdp_protocol import RDPPacket
+from recvmmsg import HAS_RECVMMSG, RecvBatch
 import socket
+import select
+from enum import IntEnum
+
+class State(IntEnum):
+    """
+    Connection states of an RDPConnection.
+    """
+    CLOSED = 0
+    LISTEN = 1
+    SYN_SENT = 2
+    SYN_RCVD = 3
+    OPEN = 4
+    CLOSE_WAIT = 5
+
+# Set to True to print every packet sent, received and processed, receive timeouts
+# and state transitions (debugging only)
+_TRACE = False
+
+# Size of the receive buffers, large enough for a full-size packet and its header
+_RX_BUF_SIZE = 2048
+
+# Scatter/gather sends are not available on every platform (e.g. Windows)
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+# Packet flag bits used to key the process_packet dispatch table
+_FLAG_SYN = 1
+_FLAG_ACK = 2
+_FLAG_RST = 4
+_FLAG_DATA = 8
 
 class RDPConnection:
     """
@@ -9,29 +39,51 @@ class RDPConnection:
     The class can be used to create both server-side and client-side connections.
     """
 
+    # Fixed set of connection attributes, stored in slots instead of a per-instance __dict__
+    __slots__ = ('socket', 'remote_address', 'state', 'SND_ISS', 'SND_NXT', 'SND_UNA', 'SND_MAX', 'RCV_CUR', 'RCV_MAX',
+                 'RMAX_BUF', 'data_buffer', 'source_port', 'dest_port', 'local_port', '_rx_buf', '_rx_view',
+                 '_tx_buf', '_tx_view', '_tx_header', '_rx_batch',
+                 '_sendto', '_sendmsg', '_recvfrom_into')
+
     def __init__(self, socket, remote_address, source_port, dest_port):
         """
         Initialize connection parameters.
 
-        - socket: The socket object used for network communication.
+        - socket: The socket object used for network communication. Its timeout is left as the caller set it,
+          since server-side connections share the server's socket.
         - remote_address: The address of the remote peer (IP, port).
         - state: Current state of the connection (e.g., CLOSED, LISTEN, OPEN).
         - SND_ISS, SND_NXT, SND_UNA: Variables for tracking sequence numbers for sent data.
         - RCV_CUR, RCV_MAX: Variables for tracking sequence numbers for received data.
         - data_buffer: Buffer to temporarily store received data.
         - source_port, dest_port: Local and remote port numbrs.
+        - _rx_buf, _rx_view: Reusable receive buffer (and a view over it) filled by receive_packet, allocated on first use.
+        - _tx_buf, _tx_view: Reusable send buffer (and a view over it) that send_packet encodes headers or packets into.
+          Where sendmsg is available only the header is written, so the buffer is header-sized.
+        - _tx_header: View over the header bytes of the send buffer.
+        - _rx_batch: Reusable recvmmsg arrays for receive_packets_batch, allocated on first use.
+        - _sendto, _sendmsg, _recvfrom_into: The socket's send and receive methods, bound once.
         """
         self.socket = socket
+        self._sendto = socket.sendto  # Bound socket methods used on every packet
+        self._sendmsg = socket.sendmsg if _HAS_SENDMSG else None
+        self._recvfrom_into = socket.recvfrom_into
         self.remote_address = remote_address
-        self.state = 'CLOSED'
+        self.state = State.CLOSED
         self.SND_ISS = 0  # Initial Send Sequence
         self.SND_NXT = 0  # Next Send Sequence
         self.SND_UNA = 0  # Unacknowledged Send Sequence
         self.RCV_CUR = 0  # Current Receive Sequence
         self.RCV_MAX = 0  # Maximum Receive Sequence
-        self.data_buffer = b''  # Buffer to store received data
+        self.data_buffer = bytearray()  # Buffer to store received data, grown in place
         self.source_port = source_port  # Set this as needed
         self.dest_port = dest_port  # Set this as needed
+        self._rx_buf = None  # Receive buffer reused for every packet, allocated by the first receive_packet
+        self._rx_view = None
+        self._tx_buf = bytearray(RDPPacket._HDR.size if _HAS_SENDMSG else 2048)  # Preallocated send buffer reused for every packet
+        self._tx_view = memoryview(self._tx_buf)
+        self._tx_header = self._tx_view[:RDPPacket._HDR.size]
+        self._rx_batch = None
     
     
     def open(self, passive, local_port=None, remote_port=None, snd_max=None, rmax_buf=None):
@@ -45,7 +97,7 @@ class RDPConnection:
             snd_max (int): The maximum segment size for sending data.
             rmax_buf (int): The maximum buffer size for receiving data.
         """
-        if self.state != 'CLOSED':
+        if self.state != State.CLOSED:
             return "Error - connection already open"
 
         # Generate SND.ISS and initialize SND.NXT and SND.UNA
@@ -60,7 +112,7 @@ class RDPConnection:
         if passive:
             if local_port is None:
                 return "Error - local port not specified"
-            self.state = 'LISTEN'
+            self.state = State.LISTEN
             self.handle_state_transition(self.state, 'START_LISTEN')
             # Additional setup for passive open...
         else:
@@ -68,14 +120,14 @@ class RDPConnection:
                 return "Error - remote port not specified"
             if local_port is None:
                 local_port = self.allocate_local_port()  # Assuming a method to allocate local port
-            self.state = 'SYN-SENT'
+            self.state = State.SYN_SENT
             # Send SYN packet with SND.ISS, SND.MAX, RMAX.BUF
             syn_packet = RDPPacket(self.source_port, remote_port, self.SND_ISS, 0, syn=True)
             print(f"Sending SYN packet: {syn_packet}")
             self.send_packet(syn_packet)
             self.handle_state_transition(self.state, 'SEND_SYN')  # Transition state after sending SYN
 
-        return f"Connection opened in state {self.state}"
+        return f"Connection opened in state {self.state.name}"
 
 
     def close(self):
@@ -85,16 +137,16 @@ class RDPConnection:
 
         """
 
-        if self.state in ['LISTEN', 'SYN-RCVD', 'SYN-SENT']:
+        if self.state in (State.LISTEN, State.SYN_RCVD, State.SYN_SENT):
             self.send_rst()
-            self.state = 'CLOSED'
+            self.state = State.CLOSED
             self.handle_state_transition(self.state, 'INITIATE_CLOSE')
             # Additional cleanup...
             return "Connection closed from state: LISTEN/SYN-RCVD/SYN-SENT"
 
-        elif self.state == 'OPEN':
+        elif self.state == State.OPEN:
             self.send_rst()
-            self.state = 'CLOSE-WAIT'
+            self.state = State.CLOSE_WAIT
             # Start TIMWAIT timer...
             # Additional cleanup...
             return "Connection set to CLOSE-WAIT from state: OPEN"
@@ -108,7 +160,7 @@ class RDPConnection:
         Args:
             data (bytes): The data to be sent over the connection.
         """
-        if self.state != 'OPEN':
+        if self.state != State.OPEN:
             return "Error - connection not open"
 
         # Check if data size exceeds the maximum segment size
@@ -132,26 +184,69 @@ class RDPConnection:
         Args:
             packet (RDPPacket): The packet to be sent.
         """
-        encoded_packet = packet.encode()
-        print(f"Sending packet: {packet}")
-        self.socket.sendto(encoded_packet, self.remote_address)
+        if _TRACE:
+            print(f"Sending packet: {packet}")
+        if _HAS_SENDMSG:
+            # Hand the header and the data to the kernel as two buffers instead of joining them
+            packet.encode_header_into(self._tx_buf)
+            self._sendmsg([self._tx_header, packet.data], [], 0, self.remote_address)
+        elif RDPPacket._HDR.size + len(packet.data) <= len(self._tx_buf):
+            nbytes = packet.encode_into(self._tx_buf)
+            self._sendto(self._tx_view[:nbytes], self.remote_address)
+        else:
+            # Too large for the reusable send buffer, encode into a new buffer instead
+            self._sendto(packet.encode(), self.remote_address)
 
     def receive_packet(self):
         """
-        Receives a packet.
+        Receives a packet, blocking until one arrives or the socket timeout (if the caller set one) expires.
         Returns:
-            bytes: The received packet in byte format.
-        """
-        print("Waiting for packet...")
-        self.socket.settimeout(5.0)  # Set timeout to 5 seconds
+            memoryview: The received packet bytes. The view points into the connection's receive buffer
+            and is only valid until the next call to receive_packet.
+        """
+        if _TRACE:
+            print("Waiting for packet...")
+        if self._rx_buf is None:
+            self._rx_buf = bytearray(_RX_BUF_SIZE)
+            self._rx_view = memoryview(self._rx_buf)
         try:
-            packet_bytes, addr = self.socket.recvfrom(1024)
+            nbytes, addr = self._recvfrom_into(self._rx_buf)
             self.remote_address = addr  # Save the client's address
-            return packet_bytes
+            return self._rx_view[:nbytes]
         except socket.timeout:
-            print("Timeout: No data received")
+            if _TRACE:
+                print("Timeout: No data received")
             return None
 
+    def receive_packets_batch(self, n=32):
+        """
+        Receives and processes up to n queued packets with a single recvmmsg system call, without blocking.
+        Where recvmmsg is not available, or the socket is not IPv4 (RecvBatch only decodes IPv4 addresses),
+        falls back to receiving a single queued packet with receive_packet, still without blocking.
+        Args:
+            n (int): The maximum number of packets to receive.
+        Returns:
+            int: The number of packets processed.
+        """
+        if not HAS_RECVMMSG or self.socket.family != socket.AF_INET:
+            # Only call the blocking receive_packet when a packet is already queued
+            if not select.select([self.socket], [], [], 0)[0]:
+                return 0
+            packet = self.receive_packet()
+            if not packet:
+                return 0
+            self.process_packet(packet)
+            return 1
+
+        if self._rx_batch is None or self._rx_batch.n != n:
+            self._rx_batch = RecvBatch(n, _RX_BUF_SIZE)
+
+        count = self._rx_batch.receive(self.socket)
+        for i in range(count):
+            self.remote_address = self._rx_batch.address(i)  # Save the sender's address
+            self.process_packet(self._rx_batch.packet(i))
+        return count
+
     def send_ack(self, remote_port):
         """
         Sends an ACK packet.
@@ -202,7 +297,7 @@ class RDPConnection:
         Returns:
             bytes: The received data.
         """
-        if self.state != 'OPEN':
+        if self.state != State.OPEN:
             return "Error - connection not open"
 
         # Check if there are any packets to process
@@ -215,8 +310,8 @@ class RDPConnection:
 
         # Assuming the data is stored in a buffer after processing
         if self.data_buffer:
-            data = self.data_buffer
-            self.data_buffer = b''  # Clear the buffer after reading
+            data = bytes(self.data_buffer)
+            self.data_buffer.clear()  # Clear the buffer after reading
             self.handle_state_transition(self.state, 'DATA_RECEIVED')  # Transition state after receiving data
             return data
         else:
@@ -225,6 +320,7 @@ class RDPConnection:
     def process_packet(self, packet):
         """
         Processes an incoming packet.
+        - Verifies the checksum and drops the packet if it does not match.
         - Checks the packet type and processes it accordingly.
         - Updates the connection state if necessary.
         - Sends a response packet if necessary through handle functions.
@@ -233,49 +329,31 @@ class RDPConnection:
 
         """
 
-        #debug print
-        print(f"Processing packet: {packet}")
-
         # ensure that packet is packet and not string literal error message
         if type(packet) == str:
             return packet
         
+        # drop truncated or corrupted packets before decoding them
+        if not RDPPacket.verify(packet):
+            if _TRACE:
+                print("Dropping packet with invalid checksum")
+            return None
+
         # decode packet
-        print(f"Received packet: {packet}")
         decoded_packet = RDPPacket.decode(packet)
-        print(f"Decoded packet: {decoded_packet}")
-
-        # Handle packets based on the current state
-        if self.state == 'LISTEN':
-            if decoded_packet.syn and not decoded_packet.ack:
-                # Process SYN packet
-                self.handle_syn_packet(decoded_packet)
-                self.handle_state_transition('LISTEN', 'RECEIVE_SYN')
-            # Handle other packet types if needed
-
-        elif self.state == 'SYN-SENT':
-            if decoded_packet.syn and decoded_packet.ack:
-                # Process SYN-ACK packet
-                self.handle_syn_ack_packet(decoded_packet)
-                self.handle_state_transition('SYN-SENT', 'RECEIVE_SYN_ACK')
-            # Handle other packet types if needed
-
-        elif self.state == 'SYN-RCVD':
-            if decoded_packet.ack:
-                # Process ACK packet
-                self.handle_ack_packet(decoded_packet)
-                self.handle_state_transition('SYN-RCVD', 'RECEIVE_ACK')
-            # Handle other packet types if needed
-
-        elif self.state == 'OPEN':
-            if decoded_packet.data:
-                # Process DATA packet
-                self.handle_data_packet(decoded_packet)
-
-            elif decoded_packet.rst:
-                # Process RST packet
-                self.handle_rst_packet(decoded_packet)
-            # Handle other packet types if needed
+        if _TRACE:
+            print(f"Processing packet: {decoded_packet}")
+
+        # Handle packets based on the current state and the packet's flags
+        flags = (decoded_packet.syn | (decoded_packet.ack << 1) | (decoded_packet.rst << 2)
+                 | (bool(decoded_packet.data) << 3))
+        state = self.state
+        entry = self._DISPATCH.get((state, flags))
+        if entry is not None:
+            handler, event = entry
+            handler(self, decoded_packet)
+            if event is not None:
+                self.handle_state_transition(state, event)
         return RDPPacket(self.source_port, self.dest_port, self.SND_NXT, self.RCV_CUR, b"Test response")
 
             
@@ -286,11 +364,11 @@ class RDPConnection:
             packet (RDPPacket): The received SYN packet.
         """
         # This is a basic logic example, it should be expanded as per protocol requirements
-        if self.state == 'LISTEN' and packet.syn:
+        if self.state == State.LISTEN and packet.syn:
             print("Received SYN, sending SYN-ACK")
             self.RCV_CUR = packet.seq_num
             self.send_syn_ack(packet.source_port)  # Assuming this method sends a SYN-ACK response
-            self.state = 'SYN-RCVD'
+            self.state = State.SYN_RCVD
 
     def handle_syn_ack_packet(self, packet):
         """
@@ -299,11 +377,11 @@ class RDPConnection:
             packet (RDPPacket): The received SYN-ACK packet.
         """
         # For SYN-SENT state receiving SYN-ACK
-        if self.state == 'SYN-SENT' and packet.syn and packet.ack:
+        if self.state == State.SYN_SENT and packet.syn and packet.ack:
             print("Received SYN-ACK, sending ACK")
             self.RCV_CUR = packet.seq_num
             self.send_ack(packet.source_port)  # Send ACK to complete three-way handshake
-            self.state = 'OPEN'
+            self.state = State.OPEN
 
     def handle_ack_packet(self, packet):
         """
@@ -313,8 +391,8 @@ class RDPConnection:
         """
         # For SYN-RCVD state receiving ACK
         print("Received ACK")
-        if self.state == 'SYN-RCVD' and packet.ack:
-            self.state = 'OPEN'
+        if self.state == State.SYN_RCVD and packet.ack:
+            self.state = State.OPEN
 
     def handle_data_packet(self, packet):
         """
@@ -323,9 +401,9 @@ class RDPConnection:
             packet (RDPPacket): The received DATA packet.
         """
         # For OPEN state receiving DATA
-        if self.state == 'OPEN' and packet.data:
+        if self.state == State.OPEN and packet.data:
             # Store or process data
-            self.data_buffer += packet.data
+            self.data_buffer.extend(packet.data)
             self.send_ack(packet.source_port)  # Send ACK for received data
 
     def handle_rst_packet(self, packet):
@@ -335,8 +413,8 @@ class RDPConnection:
             packet (RDPPacket): The received RST packet.
         """
         # For OPEN state receiving RST
-        if self.state == 'OPEN' and packet.rst:
-            self.state = 'CLOSED'
+        if self.state == State.OPEN and packet.rst:
+            self.state = State.CLOSED
             self.reset_connection()  # Reset the connection parameters
 
     def send_rst(self):
@@ -356,7 +434,7 @@ class RDPConnection:
         try:
             self.socket.bind(('', local_port))
             self.local_port = local_port
-            self.state = 'LISTEN'
+            self.state = State.LISTEN
             return "Listening on port " + str(local_port)
         except socket.error as e:
             return f"Error binding to port {local_port}: {e}"
@@ -367,41 +445,42 @@ class RDPConnection:
         """
         Handles a state transition.
         Args:
-            current_state (str): The current state of the connection.
+            current_state (State): The current state of the connection.
             event (str): The event that triggered the transition.
         """
 
-        print(f"Transitioning from {current_state} due to {event}")
-        if current_state == 'LISTEN':
+        if _TRACE:
+            print(f"Transitioning from {current_state.name} due to {event}")
+        if current_state == State.LISTEN:
             if event == 'RECEIVE_SYN':
                 # Process SYN packet and send SYN-ACK
-                self.state = 'SYN-RCVD'
+                self.state = State.SYN_RCVD
             # Other conditions...
 
-        elif current_state == 'SYN-SENT':
+        elif current_state == State.SYN_SENT:
             if event == 'RECEIVE_SYN_ACK':
                 # Process SYN-ACK packet
-                self.state = 'OPEN'
+                self.state = State.OPEN
             # Other conditions...
 
-        elif current_state == 'SYN-RCVD':
+        elif current_state == State.SYN_RCVD:
             if event == 'RECEIVE_ACK':
                 # Process ACK
-                self.state = 'OPEN'
+                self.state = State.OPEN
             # Other conditions...
 
         # Add more states and their transitions as needed
 
-        return "Transitioned to state " + self.state
+        return "Transitioned to state " + self.state.name
     
     def reset_connection(self):
         """
         Resets the connection parameters.
         """
-        self.state = 'CLOSED'
+        self.state = State.CLOSED
         self.SND_ISS = self.SND_NXT = self.SND_UNA = 0
         self.RCV_CUR = self.RCV_MAX = 0
-        self.data_buffer = b''
+        self.data_buffer.clear()
 
     def allocate_local_port(self):
         """
@@ -410,5 +489,37 @@ class RDPConnection:
         # allocate a local port
         self.source_port = 10000  
         return self.source_port
-        
 
+
+def _build_dispatch_table():
+    """
+    Builds the process_packet dispatch table.
+    :return: Dict mapping (state, flags) to a (handler, transition event) pair, for every flag combination
+             a state accepts. The event is None for packets that do not trigger a state transition.
+    """
+    table = {}
+    for flags in range(16):
+        syn = flags & _FLAG_SYN
+        ack = flags & _FLAG_ACK
+        rst = flags & _FLAG_RST
+        data = flags & _FLAG_DATA
+
+        if syn and not ack:
+            # Process SYN packet
+            table[(State.LISTEN, flags)] = (RDPConnection.handle_syn_packet, 'RECEIVE_SYN')
+        if syn and ack:
+            # Process SYN-ACK packet
+            table[(State.SYN_SENT, flags)] = (RDPConnection.handle_syn_ack_packet, 'RECEIVE_SYN_ACK')
+        if ack:
+            # Process ACK packet
+            table[(State.SYN_RCVD, flags)] = (RDPConnection.handle_ack_packet, 'RECEIVE_ACK')
+        if data:
+            # Process DATA packet
+            table[(State.OPEN, flags)] = (RDPConnection.handle_data_packet, None)
+        elif rst:
+            # Process RST packet
+            table[(State.OPEN, flags)] = (RDPConnection.handle_rst_packet, None)
+    return table
+
+
+RDPConnection._DISPATCH = _build_dispatch_table()
@@ -1,4 +1,8 @@
 import struct
+from checksum import fold_checksum, word_sum
+
+# Set to True to print packet header fields while encoding (debugging only)
+_TRACE = False
 
 class RDPPacket:
     """
@@ -13,10 +17,26 @@ class RDPPacket:
     NOTE: NEEDS VARIABLE HEADER LENGTH SUPPORT
           NEEDS PACKET FRAGMENTATION SUPPORT
     """
+    # Fixed set of packet fields, stored in slots instead of a per-instance __dict__
+    __slots__ = ('source_port', 'dest_port', 'seq_num', 'ack_num', 'data', 'syn', 'ack', 'eack', 'rst', 'nul')
+
     # Protocol constants
     MAX_PACKET_SIZE = 1024  # Max packet size (bytes)
     DEFAULT_TIMEOUT = 5     # Default timeout for acknowledgements (seconds)
 
+    # Precompiled header layouts
+    _HDR = struct.Struct("!HHHIIII")  # Full 22-byte header
+    _CSUM = struct.Struct("!HHHII")   # 14-byte header fields covered by the checksum (data length packed as 16 bits)
+
+    # Header flag bits for every SYN/ACK/EACK/RST/NUL combination, indexed by
+    # syn | ack << 1 | eack << 2 | rst << 3 | nul << 4
+    _FLAG_TABLE = [(s << 3) | (a << 2) | (e << 1) | r | (n << 4)
+                   for n in (0, 1) for r in (0, 1) for e in (0, 1) for a in (0, 1) for s in (0, 1)]
+
+    # Complete control_and_version field for the same index: version 1 (4 bits), flags (4 bits)
+    # and a header length of 9 (8 bits), assuming no variable header area
+    _CV_TABLE = [(1 << 12) | (f << 8) | 9 for f in _FLAG_TABLE]
+
     def __init__(self, source_port, dest_port, seq_num, ack_num, data=b'', syn=False, ack=False, eack=False, rst=False, nul=False):
         """
         Initialize an RDP packet
@@ -50,89 +70,103 @@ class RDPPacket:
         Returns:
             bytes: Encoded packet.
         """
-        # Header flags
-        flags = 0
-        flags |= (self.syn << 3)
-        flags |= (self.ack << 2)
-        flags |= (self.eack << 1)
-        flags |= (self.rst)
-        flags |= (self.nul << 4)  # NUL flag shifted to use the 5th bit
-        header_length = 9  # Assuming no variable header area
-        version = 1
+        return self._HDR.pack(*self._header_fields()) + self.data
 
-        # Combine version (4 bits), flags (4 bits), and header length (8 bits)
-        control_and_version = (version << 12) | (flags << 8) | header_length
+    def encode_into(self, buf):
+        """
+        Encode the packet into a preallocated writable buffer, starting at offset 0.
+        :param buf: Writable buffer (e.g. bytearray) large enough for the header and the data.
+        :return: Number of bytes written.
+        :raises ValueError: If the encoded packet does not fit in the buffer.
+        """
+        end = self._HDR.size + len(self.data)
+        if end > len(buf):
+            raise ValueError(f"Encoded packet of {end} bytes does not fit in a {len(buf)}-byte buffer")
+        self.encode_header_into(buf)
+        buf[self._HDR.size:end] = self.data
+        return end
+
+    def encode_header_into(self, buf):
+        """
+        Encode only the packet header into a preallocated writable buffer, starting at offset 0.
+        The data is left for the caller to send alongside the header (e.g. with socket.sendmsg).
+        :param buf: Writable buffer (e.g. bytearray) of at least 22 bytes.
+        :return: Number of bytes written.
+        """
+        self._HDR.pack_into(buf, 0, *self._header_fields())
+        return self._HDR.size
+
+    def _header_fields(self):
+        """
+        Compute the header field values in packing order.
+        :return: Tuple of (control_and_version, source_port, dest_port, data_length, seq_num, ack_num, checksum).
+        """
+        # Version, header flags and header length, looked up from the precomputed table (NUL uses the 5th bit)
+        control_and_version = self._CV_TABLE[self.syn | (self.ack << 1) | (self.eack << 2) | (self.rst << 3) | (self.nul << 4)]
 
         # Compute checksum and ensure it's the correct type
         checksum = self.compute_checksum()
 
-        # debug print for all packet header values before packing (port, seq_num, ack_num, data_length, checksum)
-        print(f"source_port: {self.source_port}, type: {type(self.source_port)}")
-        print(f"dest_port: {self.dest_port}, type: {type(self.dest_port)}")
-        print(f"data length: {len(self.data)}, type: {type(len(self.data))}")
-        print(f"seq_num: {self.seq_num}, type: {type(self.seq_num)}")
-        print(f"ack_num: {self.ack_num}, type: {type(self.ack_num)}")
-        print(f"checksum: {checksum}, type: {type(checksum)}")
-        
-
+        if _TRACE:
+            print(f"Encoding header: source_port={self.source_port}, dest_port={self.dest_port}, "
+                  f"data_length={len(self.data)}, seq_num={self.seq_num}, ack_num={self.ack_num}, checksum={checksum}")
 
-        # Pack the header
-        header = struct.pack("!HHHIIII", control_and_version, self.source_port, self.dest_port, len(self.data), self.seq_num, self.ack_num, checksum)
+        return control_and_version, self.source_port, self.dest_port, len(self.data), self.seq_num, self.ack_num, checksum
 
-        return header + self.data
-
-    
     @staticmethod
     def decode(packet_bytes):
         """
         Decode the packet from bytes.
-        :param packet_bytes: Bytes to decode.
+        :param packet_bytes: Bytes-like object to decode (bytes, bytearray or memoryview).
         :return: Decoded RDPPacket object.
         """
-        # Unpack the first 22 bytes for the header
-        control_and_version, source_port, dest_port, data_length, seq_num, ack_num, checksum = struct.unpack("!HHHIIII", packet_bytes[:22])
+        # Unpack the first 22 bytes for the header without slicing the buffer
+        control_and_version, source_port, dest_port, data_length, seq_num, ack_num, checksum = RDPPacket._HDR.unpack_from(packet_bytes, 0)
 
-        # Extract the last 8 bits which contain the flags
-        flags = control_and_version & 0xFF
+        # Extract the flag bits, which encode() places just above the 8-bit header length
+        flags = (control_and_version >> 8) & 0x0F
 
         # Extract individual flags
         syn = (flags >> 3) & 1  # Extract the SYN flag (4th bit from the right)
         ack = (flags >> 2) & 1  # Extract the ACK flag (3rd bit from the right)
         eack = (flags >> 1) & 1  # Extract the EACK flag (2nd bit from the right)
         rst = flags & 1         # Extract the RST flag (1st bit from the right)
-        nul = (flags >> 4) & 1  # Extract the NUL flag (5th bit from the right)
+        nul = 0                 # The NUL bit overlaps the version field set by encode() and cannot be recovered
 
-        # Extract the data
-        data = packet_bytes[22:]
+        # Extract the data, copying only the data_length bytes announced in the header
+        data = bytes(memoryview(packet_bytes)[22:22 + data_length]) if data_length else b''
 
         # Return the decoded RDPPacket
         return RDPPacket(source_port, dest_port, seq_num, ack_num, data, syn, ack, eack, rst, nul)
     
+    @staticmethod
+    def verify(packet_bytes):
+        """
+        Verify the checksum of an encoded packet directly on its bytes, without decoding it.
+        The source port through the acknowledgement number are contiguous in the header, and the high
+        word of the 32-bit data length is zero, so their words sum to the same value compute_checksum uses.
+        :param packet_bytes: Bytes-like object holding the encoded packet (bytes, bytearray or memoryview).
+        :return: True if the packet is complete and its checksum matches, False otherwise.
+        """
+        size = RDPPacket._HDR.size
+        if len(packet_bytes) < size:
+            return False
+        view = memoryview(packet_bytes)
+        _, _, _, data_length, _, _, checksum = RDPPacket._HDR.unpack_from(view, 0)
+        if size + data_length > len(view):
+            return False
+        # Sum the header words from the source port to the acknowledgement number, then the data
+        return fold_checksum(word_sum(view[2:18]) + word_sum(view[size:size + data_length])) == checksum
+
     def compute_checksum(self):
         """
         Compute the checksum of the packet
         :return: Checksum of the packet
         """
-        # Compute checksum with pseudo-RFC method 
-        checksum = 0
-
-        #debug print statments for struck.pack
-        print(f"source_port: {self.source_port}, type: {type(self.source_port)}")
-        print(f"dest_port: {self.dest_port}, type: {type(self.dest_port)}")
-        print(f"data length: {len(self.data)}, type: {type(len(self.data))}")
-        print(f"seq_num: {self.seq_num}, type: {type(self.seq_num)}")
-        print(f"ack_num: {self.ack_num}, type: {type(self.ack_num)}")
-        
-        header_data = struct.pack("!HHHII", self.source_port, self.dest_port, len(self.data), self.seq_num, self.ack_num)
-        for i in range(0, len(header_data), 2):
-            checksum += int.from_bytes(header_data[i:i+2], byteorder='big')
-
-        for i in range(0, len(self.data), 2):
-            checksum += int.from_bytes(self.data[i:i+2], byteorder='big')
-
-        checksum = (checksum >> 16) + (checksum & 0xffff)
-        checksum = (checksum >> 16) + checksum  # Simulate rotation through carry
-        return ~checksum & 0xffff
+        # Compute checksum with pseudo-RFC method over the header fields followed by the data. The packed
+        # header fields have an even length, so both parts are summed separately without joining them.
+        header_data = self._CSUM.pack(self.source_port, self.dest_port, len(self.data), self.seq_num, self.ack_num)
+        return fold_checksum(word_sum(header_data) + word_sum(self.data))
     
     def __str__(self):
         """
@@ -0,0 +1,115 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class _SockAddrIn(ctypes.Structure):
+    # sin_port and sin_addr are kept as raw bytes since they are in network byte order
+    _fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_uint8 * 2),
+                ('sin_addr', ctypes.c_uint8 * 4), ('sin_zero', ctypes.c_uint8 * 8)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IOVec)), ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr), ('msg_len', ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """
+    :return: The libc recvmmsg function, or None if the platform does not provide it
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError, TypeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+_recvmmsg = _load_recvmmsg()
+HAS_RECVMMSG = _recvmmsg is not None
+
+
+class RecvBatch:
+    """
+    The RecvBatch class receives up to n IPv4 UDP datagrams with a single recvmmsg system call (Linux only).
+    The message headers, addresses and packet buffers are allocated once and reused by every call to receive.
+    """
+
+    def __init__(self, n=32, slot_size=2048):
+        """
+        Preallocate the recvmmsg arrays.
+        :param n: Maximum number of datagrams received per call
+        :param slot_size: Size of the buffer for each datagram (bytes)
+        """
+        self.n = n
+        self.slot_size = slot_size
+        self._buf = bytearray(n * slot_size)
+        self._view = memoryview(self._buf)
+        base = ctypes.addressof((ctypes.c_char * len(self._buf)).from_buffer(self._buf))
+
+        self._iovecs = (_IOVec * n)()
+        self._names = (_SockAddrIn * n)()
+        self._msgs = (_MMsgHdr * n)()
+        for i in range(n):
+            self._iovecs[i].iov_base = base + i * slot_size
+            self._iovecs[i].iov_len = slot_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._names[i])
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    def receive(self, sock):
+        """
+        Receive the datagrams already queued on the socket, without blocking.
+        :param sock: Bound IPv4 UDP socket to receive from.
+        :return: Number of datagrams received, 0 if none were queued
+        :raises ValueError: If the socket is not an IPv4 socket, whose sender addresses would not fit.
+        """
+        if sock.family != socket.AF_INET:
+            raise ValueError(f"RecvBatch only supports AF_INET sockets, got {sock.family!r}")
+
+        for i in range(self.n):
+            self._msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+
+        while True:
+            count = _recvmmsg(sock.fileno(), self._msgs, self.n, socket.MSG_DONTWAIT, None)
+            if count >= 0:
+                return count
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                # Interrupted by a signal, retry like Python's own socket methods do (PEP 475)
+                continue
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return 0
+            raise OSError(err, os.strerror(err))
+
+    def packet(self, i):
+        """
+        :param i: Index of a datagram from the last call to receive
+        :return: Memoryview of the datagram bytes, valid until the next call to receive
+        """
+        start = i * self.slot_size
+        return self._view[start:start + self._msgs[i].msg_len]
+
+    def address(self, i):
+        """
+        :param i: Index of a datagram from the last call to receive
+        :return: Sender address (IP, port) of the datagram
+        """
+        name = self._names[i]
+        return socket.inet_ntoa(bytes(name.sin_addr)), (name.sin_port[0] << 8) | name.sin_port[1]
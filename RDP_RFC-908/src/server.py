@@ -1,34 +1,111 @@
 import socket
-from rdp_connection import RDPConnection  
+import selectors
+import time
+from rdp_connection import RDPConnection, State
+from recvmmsg import HAS_RECVMMSG, RecvBatch
+
+# Seconds without packets from a client after which its connection is dropped
+IDLE_TIMEOUT = 60
 
 def run_server(local_port):
     """
     Runs an RDP server that listens on a specified port, accepts connections, and processes incoming data.
+    A single socket is multiplexed across all clients, with one RDPConnection kept per remote address.
 
     Args:
         local_port (int): The local port number on which the server listens for incoming connections.
     """
-    # Create a socket for the server
+    # Create a socket for the server and bind it to the local port
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_socket.bind(('', local_port))
+    print("Listening on port " + str(local_port))
+
+    # Wait for readability with the platform's best selector (epoll on Linux)
+    selector = selectors.DefaultSelector()
+    selector.register(server_socket, selectors.EVENT_READ)
 
-    # Create an RDP connection instance for the server
-    server_connection = RDPConnection(server_socket, None, local_port, None)
+    # RDP connections and the time their last packet arrived, keyed by the remote address of each client
+    connections = {}
+    last_seen = {}
 
-    # Bind the socket to the local port and start listening
-    print(server_connection.listen(local_port))
+    # Receive buffers shared by all connections, packets are processed before the next receive.
+    # Where recvmmsg is available, every queued datagram is drained with a single system call.
+    if HAS_RECVMMSG:
+        rx_batch = RecvBatch(32)
+    else:
+        rx_batch = None
+        rx_buf = bytearray(2048)
+        rx_view = memoryview(rx_buf)
 
     print("Server is listening for incoming connections...")
 
+    last_sweep = time.monotonic()
     while True:
-        # Receive a packet
-        packet = server_connection.receive_packet()
-        if packet:
-            # Process the packet
-            response = server_connection.process_packet(packet)
-
-            # Check if there is data to send back
-            if response and response.data:
-                server_connection.send(response.data)
-        
+        for _ in selector.select(timeout=1.0):
+            if rx_batch is not None:
+                # Receive all queued packets
+                for i in range(rx_batch.receive(server_socket)):
+                    dispatch_packet(connections, last_seen, server_socket, local_port, rx_batch.packet(i), rx_batch.address(i))
+            else:
+                # Receive a packet
+                nbytes, addr = server_socket.recvfrom_into(rx_buf)
+                dispatch_packet(connections, last_seen, server_socket, local_port, rx_view[:nbytes], addr)
+
+        # At most once a second, drop connections of clients that went quiet (e.g. never finished the
+        # handshake or died without sending RST)
+        now = time.monotonic()
+        if now - last_sweep >= 1.0:
+            expire_idle_connections(connections, last_seen, now)
+            last_sweep = now
+
+
+def dispatch_packet(connections, last_seen, server_socket, local_port, packet, addr):
+    """
+    Hands a received packet to the RDP connection of the client that sent it.
+
+    Args:
+        connections (dict): RDP connections keyed by the remote address of each client.
+        last_seen (dict): Time (time.monotonic) of the last packet from each client, keyed by remote address.
+        server_socket (socket.socket): The server socket shared by all connections.
+        local_port (int): The local port number the server listens on.
+        packet (memoryview): The received packet bytes.
+        addr (tuple): The address (IP, port) of the client that sent the packet.
+    """
+    # Look up the connection for this client, opening a passive one on its first packet
+    connection = connections.get(addr)
+    if connection is None:
+        connection = RDPConnection(server_socket, addr, local_port, addr[1])
+        connection.open(passive=True, local_port=local_port)
+        connections[addr] = connection
+
+    # Process the packet
+    response = connection.process_packet(packet)
+
+    # Check if there is data to send back
+    if response and response.data:
+        connection.send(response.data)
+
+    # Forget connections that did not get past LISTEN (no valid SYN) or were closed, so closed clients
+    # can connect again and packets from unknown addresses do not keep connections alive
+    if connection.state in (State.LISTEN, State.CLOSED, State.CLOSE_WAIT):
+        del connections[addr]
+        last_seen.pop(addr, None)
+    else:
+        last_seen[addr] = time.monotonic()
+
+
+def expire_idle_connections(connections, last_seen, now):
+    """
+    Drops the connections of clients that have not sent a packet for IDLE_TIMEOUT seconds.
+
+    Args:
+        connections (dict): RDP connections keyed by the remote address of each client.
+        last_seen (dict): Time (time.monotonic) of the last packet from each client, keyed by remote address.
+        now (float): The current time (time.monotonic).
+    """
+    for addr in [addr for addr, seen in last_seen.items() if now - seen > IDLE_TIMEOUT]:
+        del connections[addr]
+        del last_seen[addr]
+
 
 run_server(12345)  # Run the server on port 12345
@@ -1,12 +1,12 @@
-import random
 import os
 
 
 def generate_initial_sequence_number():
     """
-    :return: Generate a random initial sequence number
+    :return: Generate a random initial sequence number from the operating system's random source.
+             The top bit is cleared so SND.NXT can advance without overflowing the 32-bit header field.
     """
-    return random.randint(0, 10000)  
+    return int.from_bytes(os.urandom(4), 'big') & 0x7fffffff
 
 def read_image_as_byte_stream(image_path):
     """
@@ -1,6 +1,6 @@
 import socket
-from src.rdp_connection import RDPConnection  
-import time
+from src.rdp_connection import RDPConnection, State  
+from src.rdp_protocol import RDPPacket
 
 def run_client(server_ip, server_port):
     """
@@ -13,6 +13,7 @@ def run_client(server_ip, server_port):
     """
     # Create a socket for the client
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client_socket.settimeout(RDPPacket.DEFAULT_TIMEOUT)  # Blocking receives give up after the default timeout
 
     # Create an RDP connection instance for the client
     client_connection = RDPConnection(client_socket, (server_ip, server_port), None, server_port)
@@ -22,18 +23,15 @@ def run_client(server_ip, server_port):
     print(open_status)
 
     # Wait for the connection to be established (state to be "OPEN")
-    while client_connection.state != 'OPEN':
-        #  add a sleep interval to avoid a busy wait
-        time.sleep(0.1)
-
-        # Check for incoming packets (like SYN-ACK) and process them
+    while client_connection.state != State.OPEN:
+        # Block until a packet (like SYN-ACK) arrives or the socket times out, then process it
         packet = client_connection.receive_packet()
         if packet:
             client_connection.process_packet(packet)
         
 
     # Send data to the server after the connection is established
-    if client_connection.state == 'OPEN':
+    if client_connection.state == State.OPEN:
         data = "Hello, server!"
         print(f"Sending data: {data}")
         client_connection.send(data.encode())